@@ -1,8 +1,9 @@
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
 import inventory_manager as inv
+import jobs
 from datetime import datetime
 
 today = datetime.now().date().isoformat()
@@ -18,6 +19,7 @@ navbar = dbc.NavbarSimple(
                 dbc.DropdownMenuItem("Product Catalog Management", id="page-1-link"),
                 dbc.DropdownMenuItem("Stock In/Out Management", id="page-2-link"),
                 dbc.DropdownMenuItem("Sale Analysis", id="page-3-link"),
+                dbc.DropdownMenuItem("Reorder Report", id="page-6-link"),
                 dbc.DropdownMenuItem(divider=True),
                 dbc.DropdownMenuItem("Products List", id="page-4-link"),
                 dbc.DropdownMenuItem("Transactions List", id="page-5-link"),
@@ -148,7 +150,11 @@ html2 = dbc.Container([
                           'margin-bottom': '15px'}),
 
                 # Submit button
-                html.Button('Submit', id='submit-btn-transaction', style={'margin-bottom': '15px'}),
+                html.Button('Submit', id='submit-btn-transaction', style={'margin-bottom': '15px', 'margin-right': '10px'}),
+                html.Button('Cancel', id='cancel-btn-transaction', style={'margin-bottom': '15px'}),
+                # Background query job
+                dcc.Store(id='transaction-job'),
+                dcc.Interval(id='transaction-job-poll', interval=500, disabled=True),
                 # Update status
                 html.Div(id='update-transaction-status')
             ])
@@ -179,7 +185,11 @@ html3 = dbc.Container([
                           'margin-bottom': '15px'}),
 
                 # Submit button
-                html.Button('Submit', id='submit-btn-sale', style={'margin-bottom': '15px'}),
+                html.Button('Submit', id='submit-btn-sale', style={'margin-bottom': '15px', 'margin-right': '10px'}),
+                html.Button('Cancel', id='cancel-btn-sale', style={'margin-bottom': '15px'}),
+                # Background report job
+                dcc.Store(id='sale-job'),
+                dcc.Interval(id='sale-job-poll', interval=500, disabled=True),
                 # Update status
                 html.Div(id='sale-list')
             ]),
@@ -194,6 +204,8 @@ html4 = dbc.Container([
             # Section: Product Catalog Lookup
             html.Div([
                 dcc.Interval(id='refresh-1', interval=3*1000, n_intervals=0),
+                # Version of the table on this client, so each refresh only sends what changed
+                dcc.Store(id='product-list-cursor'),
                 # Update status
                 html.Div(id='all-product-list')
             ]),
@@ -208,6 +220,8 @@ html5 = dbc.Container([
             # Section: Product Catalog Lookup
             html.Div([
                 dcc.Interval(id='refresh-2', interval=3*1000, n_intervals=0),
+                # Rows already on this client, so each refresh only sends what changed
+                dcc.Store(id='transaction-list-cursor'),
                 # Update status
                 html.Div(id='all-transaction-list')
             ]),
@@ -215,6 +229,42 @@ html5 = dbc.Container([
     ])
 ])
 
+html6 = dbc.Container([
+    dbc.Card([
+        dbc.CardHeader(html.H2('Reorder Report', className="display-5")),
+        dbc.CardBody([
+            # Section: Velocity and reorder parameters
+            html.Div([
+                html.H2('Choose Parameters'),
+                html.Div([
+                    dcc.Dropdown(id='category-6',
+                        options=[{'label': c, 'value': c} for c in inv.view_products_by_category().keys()],
+                        placeholder="Category (Optional)", style={'width': '90%', 'margin-right': '2%'}),
+                    dcc.Input(id='lead-time-6', type='number', placeholder='Lead Time (Days)', value=7, min=0,
+                              style={'width': '50%', 'height': '35px', 'margin-right': '2%'}),
+                    dcc.Input(id='safety-days-6', type='number', placeholder='Safety Stock (Days)', value=7, min=0,
+                              style={'width': '50%', 'height': '35px', 'margin-right': '2%'}),
+                    dcc.Input(id='review-days-6', type='number', placeholder='Review Period (Days)', value=14, min=0,
+                              style={'width': '50%', 'height': '35px', 'margin-right': '2%'}),
+                ], style={'display': 'flex', 'justify-content': 'space-between', 'align-items': 'center',
+                          'margin-bottom': '15px'}),
+                dcc.Checklist(id='show-all-6', options=[{'label': ' Show products that do not need reordering',
+                                                         'value': 'all'}],
+                              value=[], style={'margin-bottom': '15px'}),
+
+                # Submit button
+                html.Button('Submit', id='submit-btn-reorder', style={'margin-bottom': '15px', 'margin-right': '10px'}),
+                html.Button('Cancel', id='cancel-btn-reorder', style={'margin-bottom': '15px'}),
+                # Background report job
+                dcc.Store(id='reorder-job'),
+                dcc.Interval(id='reorder-job-poll', interval=500, disabled=True),
+                # Update status
+                html.Div(id='reorder-list')
+            ]),
+        ])
+    ])
+])
+
 app.layout = html.Div([
     html.Link(
         href='https://fonts.googleapis.com/css?family=Roboto&display=swap',  # Import Roboto font from Google Fonts
@@ -246,15 +296,20 @@ def page_entry5():
     return html5
 
 
+def page_entry6():
+    return html6
+
+
 @app.callback(
     Output('page-content', 'children'),
     [Input('page-1-link', 'n_clicks'),
      Input('page-2-link', 'n_clicks'),
      Input('page-3-link', 'n_clicks'),
      Input('page-4-link', 'n_clicks'),
-     Input('page-5-link', 'n_clicks'),]
+     Input('page-5-link', 'n_clicks'),
+     Input('page-6-link', 'n_clicks'),]
 )
-def display_page(page_1_clicks, page_2_clicks, page_3_clicks, page_4_clicks, page_5_clicks):
+def display_page(page_1_clicks, page_2_clicks, page_3_clicks, page_4_clicks, page_5_clicks, page_6_clicks):
     ctx = dash.callback_context
 
     if not ctx.triggered:
@@ -272,6 +327,8 @@ def display_page(page_1_clicks, page_2_clicks, page_3_clicks, page_4_clicks, pag
         return page_entry4()
     elif button_id == "page-5-link":
         return page_entry5()
+    elif button_id == "page-6-link":
+        return page_entry6()
 
 
 @app.callback(
@@ -370,17 +427,63 @@ def combine_date_and_time(start_date, start_time):
     return combined_datetime.isoformat()
 
 
+# Heavy reports run as background jobs; the page polls the job until it finishes
+def report_job_status(job_id, cancel=False):
+    if not job_id:
+        return dash.no_update, dash.no_update, True
+    if cancel:
+        jobs.cancel(job_id)
+        return "Cancelled.", None, True
+
+    state, value = jobs.poll(job_id)
+    if state == 'running':
+        done, total = value
+        if total:
+            return f"Running... {done * 100 // total}%", dash.no_update, False
+        return "Running...", dash.no_update, False
+    if state == 'done':
+        return value, None, True
+    if state == 'cancelled':
+        return "Cancelled.", None, True
+    if state == 'error':
+        return f"Report failed: {value}", None, True
+    return "Report expired. Please submit again.", None, True
+
+
+def stop_report_job(job_id, message):
+    if job_id:
+        jobs.cancel(job_id)
+    return message, None, True
+
+
+def start_report_job(job_id, name, fn, *args):
+    # a new submission replaces this client's previous job
+    if job_id:
+        jobs.cancel(job_id)
+    return "Running...", jobs.submit(name, fn, *args), False
+
+
 @app.callback(
-    Output('update-transaction-status', 'children'),
-    [Input('submit-btn-transaction', 'n_clicks')],
-    [Input('product-id-3', 'value'),
-     Input('user-3', 'value'),
-     Input('start-date-3', 'value'),
-     Input('start-time-3', 'value'),
-     Input('end-date-3', 'value'),
-     Input('end-time-3', 'value'),]
+    [Output('update-transaction-status', 'children'),
+     Output('transaction-job', 'data'),
+     Output('transaction-job-poll', 'disabled')],
+    [Input('submit-btn-transaction', 'n_clicks'),
+     Input('cancel-btn-transaction', 'n_clicks'),
+     Input('transaction-job-poll', 'n_intervals')],
+    [State('product-id-3', 'value'),
+     State('user-3', 'value'),
+     State('start-date-3', 'value'),
+     State('start-time-3', 'value'),
+     State('end-date-3', 'value'),
+     State('end-time-3', 'value'),
+     State('transaction-job', 'data')]
 )
-def query_transaction(n_clicks, product_id, user, start_date, start_time, end_date, end_time):
+def query_transaction(n_clicks, cancel_clicks, n_intervals, product_id, user, start_date, start_time, end_date,
+                      end_time, job_id):
+    button_id = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
+    if button_id in ('transaction-job-poll', 'cancel-btn-transaction'):
+        return report_job_status(job_id, cancel=button_id == 'cancel-btn-transaction')
+
     if n_clicks:
         if start_time:
             start_time = combine_date_and_time(start_date, start_time)
@@ -391,24 +494,34 @@ def query_transaction(n_clicks, product_id, user, start_date, start_time, end_da
         else:
             end_time = None
         if not (product_id or user or start_time or end_time):
-            return "Please select at least one filter."
+            return stop_report_job(job_id, "Please select at least one filter.")
         if start_time and end_time:
             if start_time >= end_time:
-                return "Start time must be before end time."
-        return inv.query_transactions(product_id, user, start_time, end_time)
-    return ""
+                return stop_report_job(job_id, "Start time must be before end time.")
+        return start_report_job(job_id, 'query_transactions', inv.query_transactions,
+                                product_id, user, start_time, end_time)
+    return "", dash.no_update, dash.no_update
 
 
 @app.callback(
-    Output('sale-list', 'children'),
-    [Input('submit-btn-sale', 'n_clicks')],
-    [Input('category-4', 'value'),
-     Input('start-date-4', 'value'),
-     Input('start-time-4', 'value'),
-     Input('end-date-4', 'value'),
-     Input('end-time-4', 'value'),]
+    [Output('sale-list', 'children'),
+     Output('sale-job', 'data'),
+     Output('sale-job-poll', 'disabled')],
+    [Input('submit-btn-sale', 'n_clicks'),
+     Input('cancel-btn-sale', 'n_clicks'),
+     Input('sale-job-poll', 'n_intervals')],
+    [State('category-4', 'value'),
+     State('start-date-4', 'value'),
+     State('start-time-4', 'value'),
+     State('end-date-4', 'value'),
+     State('end-time-4', 'value'),
+     State('sale-job', 'data')]
 )
-def sales_summary(n_clicks, category, start_date, start_time, end_date, end_time):
+def sales_summary(n_clicks, cancel_clicks, n_intervals, category, start_date, start_time, end_date, end_time, job_id):
+    button_id = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
+    if button_id in ('sale-job-poll', 'cancel-btn-sale'):
+        return report_job_status(job_id, cancel=button_id == 'cancel-btn-sale')
+
     if n_clicks:
         if start_time:
             start_time = combine_date_and_time(start_date, start_time)
@@ -420,25 +533,59 @@ def sales_summary(n_clicks, category, start_date, start_time, end_date, end_time
             end_time = None
         if start_time and end_time:
             if start_time > end_time:
-                return "Start time must be before end time."
-        return inv.sales_summary(start_time, end_time, category)
-    return ""
+                return stop_report_job(job_id, "Start time must be before end time.")
+        return start_report_job(job_id, 'sales_summary', inv.sales_summary, start_time, end_time, category)
+    return "", dash.no_update, dash.no_update
+
+
+@app.callback(
+    [Output('reorder-list', 'children'),
+     Output('reorder-job', 'data'),
+     Output('reorder-job-poll', 'disabled')],
+    [Input('submit-btn-reorder', 'n_clicks'),
+     Input('cancel-btn-reorder', 'n_clicks'),
+     Input('reorder-job-poll', 'n_intervals')],
+    [State('category-6', 'value'),
+     State('lead-time-6', 'value'),
+     State('safety-days-6', 'value'),
+     State('review-days-6', 'value'),
+     State('show-all-6', 'value'),
+     State('reorder-job', 'data')]
+)
+def reorder_report(n_clicks, cancel_clicks, n_intervals, category, lead_time, safety_days, review_days, show_all,
+                   job_id):
+    button_id = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
+    if button_id in ('reorder-job-poll', 'cancel-btn-reorder'):
+        return report_job_status(job_id, cancel=button_id == 'cancel-btn-reorder')
+
+    if n_clicks:
+        if lead_time is None or safety_days is None or review_days is None:
+            return stop_report_job(job_id, "Please input lead time, safety stock and review period.")
+        if min(lead_time, safety_days, review_days) < 0:
+            return stop_report_job(job_id, "Days must not be negative.")
+        return start_report_job(job_id, 'reorder_report', inv.reorder_report,
+                                lead_time, safety_days, review_days, category, 'all' in (show_all or []))
+    return "", dash.no_update, dash.no_update
 
 
 @app.callback(
-    Output('all-product-list', 'children'),
-    [Input('refresh-1', 'n_intervals')]
+    [Output('all-product-list', 'children'),
+     Output('product-list-cursor', 'data')],
+    [Input('refresh-1', 'n_intervals')],
+    [State('product-list-cursor', 'data')]
 )
-def display_products(n_intervals):
-    return inv.display_all_products()
+def display_products(n_intervals, cursor):
+    return inv.update_all_products(cursor)
 
 
 @app.callback(
-    Output('all-transaction-list', 'children'),
-    [Input('refresh-2', 'n_intervals')]
+    [Output('all-transaction-list', 'children'),
+     Output('transaction-list-cursor', 'data')],
+    [Input('refresh-2', 'n_intervals')],
+    [State('transaction-list-cursor', 'data')]
 )
-def display_transactions(n_intervals):
-    return inv.display_all_transactions()
+def display_transactions(n_intervals, cursor):
+    return inv.update_all_transactions(cursor)
 
 
 if __name__ == '__main__':
@@ -1,8 +1,12 @@
 import os
 import json
-from datetime import datetime
+import math
+import bisect
+import hashlib
+import threading
+from datetime import datetime, timedelta
 from collections import OrderedDict
-from dash import html
+from dash import html, no_update, Patch
 
 DATA_DIR = 'data'
 PRODUCTS_FILE = os.path.join(DATA_DIR, 'products.json')
@@ -87,7 +91,9 @@ def add_product(product_id, product_name, category, user):
         'name': product_name,
         'stock': 0,
         'category': category,
-        'user': user
+        'user': user,
+        # a re-added ID starts from zero stock, so history before this belongs to the old product
+        'created': datetime.now().isoformat()
     }
     write_json(PRODUCTS_FILE, products)
     return "Product added successfully."
@@ -137,23 +143,74 @@ def view_products_sorted_by_stock(category):
                       style={'width': '100%', 'border': '1px solid black', 'border-collapse': 'collapse'})
 
 
+# Filter and render records in steps, reporting progress(done, total) between steps
+PROGRESS_STEP = 10000
+RENDER_STEP = 100
+REPORT_ROWS = 500
+
+
+def stage_progress(progress, stage, stages):
+    # map one stage's (done, total) onto the whole report
+    if progress is None:
+        return None
+
+    def report(done, total):
+        if total:
+            progress(stage * total + done, stages * total)
+        else:
+            progress(stage, stages)
+    return report
+
+
+def filter_records(records, keep, progress=None):
+    if progress is None:
+        return [r for r in records if keep(r)]
+    kept = []
+    total = len(records)
+    for start in range(0, total, PROGRESS_STEP):
+        progress(start, total)
+        kept.extend(r for r in records[start:start + PROGRESS_STEP] if keep(r))
+    progress(total, total)
+    return kept
+
+
+def render_rows(records, make_row, progress=None):
+    rows = []
+    total = len(records)
+    for start in range(0, total, RENDER_STEP):
+        if progress:
+            progress(start, total)
+        rows.extend(make_row(r) for r in records[start:start + RENDER_STEP])
+    if progress:
+        progress(total, total)
+    return rows
+
+
+def capped_note(shown, total, what):
+    if total <= shown:
+        return None
+    return html.P(f"Showing the first {shown} of {total} {what}. Narrow the filters to see the rest.")
+
+
 # 5. Query Transaction Records
-def query_transactions(product_id=None, user=None, start_time=None, end_time=None):
-    transactions = read_json(TRANSACTIONS_FILE)
-    filtered_transactions = transactions
+def query_transactions(product_id=None, user=None, start_time=None, end_time=None, progress=None):
+    transactions = read_json(TRANSACTIONS_FILE) or []
+
+    def keep(t):
+        return ((not product_id or t['product_id'] == product_id) and
+                (not user or t['operator'] == user) and
+                (not start_time or start_time <= t['timestamp']) and
+                (not end_time or t['timestamp'] <= end_time))
 
-    if product_id:
-        filtered_transactions = [t for t in filtered_transactions if t['product_id'] == product_id]
-    if user:
-        filtered_transactions = [t for t in filtered_transactions if t['operator'] == user]
-    if start_time:
-        filtered_transactions = [t for t in filtered_transactions if start_time <= t['timestamp']]
-    if end_time:
-        filtered_transactions = [t for t in filtered_transactions if t['timestamp'] <= end_time]
+    filtered_transactions = filter_records(transactions, keep, stage_progress(progress, 0, 2))
 
     if not filtered_transactions:
         return html.P("No transactions match the criteria.")
 
+    # rendering rows is the slow part, so only the first REPORT_ROWS are built
+    note = capped_note(REPORT_ROWS, len(filtered_transactions), "matching transactions")
+    filtered_transactions = filtered_transactions[:REPORT_ROWS]
+
     # Build the table header
     table_header = html.Thead(html.Tr([
         html.Th("Product ID"),
@@ -165,39 +222,29 @@ def query_transactions(product_id=None, user=None, start_time=None, end_time=Non
     ]))
 
     # Build the table body by iterating over filtered transactions
-    table_body = html.Tbody([
-        html.Tr([
-            html.Td(transaction['product_id']),
-            html.Td(transaction['product_name']),
-            html.Td(transaction['operation_type']),
-            html.Td(transaction['operator']),
-            html.Td(transaction['timestamp']),
-            html.Td(transaction['quantity'])
-        ]) for transaction in filtered_transactions
-    ])
+    table_body = html.Tbody(render_rows(filtered_transactions, transaction_row, stage_progress(progress, 1, 2)))
 
-    return html.Table([table_header, table_body],
-                      style={'width': '100%', 'border': '1px solid black', 'border-collapse': 'collapse'})
+    table = html.Table([table_header, table_body],
+                       style={'width': '100%', 'border': '1px solid black', 'border-collapse': 'collapse'})
+    return html.Div([note, table]) if note else table
 
 
 # 6. Sales Summary
-def sales_summary(start_time, end_time, category=None):
-    transactions = read_json(TRANSACTIONS_FILE)
-    sales = [t for t in transactions if t['operation_type'] == "sale"]
-
-    if not sales:
+def sales_summary(start_time, end_time, category=None, progress=None):
+    transactions = read_json(TRANSACTIONS_FILE) or []
+    if not any(t['operation_type'] == "sale" for t in transactions):
         return html.P("No transaction records available.")
 
-    # time filter
-    if start_time:
-        sales = [t for t in sales if start_time <= t['timestamp']]
-    if end_time:
-        sales = [t for t in sales if t['timestamp'] <= end_time]
+    # time and category filter
+    products = read_json(PRODUCTS_FILE) if category else {}
 
-    # category filter
-    if category:
-        products = read_json(PRODUCTS_FILE)
-        sales = [s for s in sales if products[s['product_id']]['category'] == category]
+    def keep(t):
+        return (t['operation_type'] == "sale" and
+                (not start_time or start_time <= t['timestamp']) and
+                (not end_time or t['timestamp'] <= end_time) and
+                (not category or products[t['product_id']]['category'] == category))
+
+    sales = filter_records(transactions, keep, stage_progress(progress, 0, 2))
 
     summary = {}
     for sale in sales:
@@ -207,6 +254,7 @@ def sales_summary(start_time, end_time, category=None):
     if not summary:
         return html.P("No sales records available for the specified period.")
     summary = OrderedDict(sorted(summary.items(), key=lambda x: x[1], reverse=True))
+    note = capped_note(REPORT_ROWS, len(summary), "products")
 
     # table header
     table_header = html.Thead(html.Tr([
@@ -215,39 +263,56 @@ def sales_summary(start_time, end_time, category=None):
     ]))
 
     # table body
-    table_body = html.Tbody([
-        html.Tr([
-            html.Td(product_name),
-            html.Td(quantity)
-        ]) for product_name, quantity in summary.items()
-    ])
+    table_body = html.Tbody(render_rows(
+        list(summary.items())[:REPORT_ROWS],
+        lambda item: html.Tr([
+            html.Td(item[0]),
+            html.Td(item[1])
+        ]),
+        stage_progress(progress, 1, 2)
+    ))
 
-    return html.Table([table_header, table_body], style={'width': '50%', 'border': '1px solid black', 'border-collapse': 'collapse'})
+    table = html.Table([table_header, table_body], style={'width': '50%', 'border': '1px solid black', 'border-collapse': 'collapse'})
+    return html.Div([note, table]) if note else table
 
 
 # 7. Display all products
-def display_all_products():
-    products = read_json(PRODUCTS_FILE)
-    if not products:
-        return html.P("No product records available.")
-
-    sorted_products = {}
+def group_products(products):
+    grouped = {}
 
     # categorize the product
     for product_id, product_info in products.items():
         category = product_info['category']
-        if category not in sorted_products:
-            sorted_products[category] = []
-        sorted_products[category].append(product_info)
+        if category not in grouped:
+            grouped[category] = []
+        grouped[category].append(product_info)
 
     # sort down by stock
-    for category in sorted_products:
-        sorted_products[category].sort(key=lambda x: x['stock'], reverse=True)
+    for category in grouped:
+        grouped[category].sort(key=lambda x: x['stock'], reverse=True)
+
+    return sorted(grouped.items())
+
+
+def product_row(item):
+    return html.Tr([
+        html.Td(item['id']),
+        html.Td(item['name']),
+        html.Td(item['stock']),
+        html.Td(item['user'])
+    ])
+
+
+def display_all_products(products=None):
+    if products is None:
+        products = read_json(PRODUCTS_FILE)
+    if not products:
+        return html.P("No product records available.")
 
     tables = []
 
     # particular form for each category
-    for category, items in sorted(sorted_products.items()):
+    for category, items in group_products(products):
         # table header
         table_header = html.Thead(html.Tr([
             html.Th("ID"),
@@ -257,14 +322,7 @@ def display_all_products():
         ]))
 
         # table body
-        table_body = html.Tbody([
-            html.Tr([
-                html.Td(item['id']),
-                html.Td(item['name']),
-                html.Td(item['stock']),
-                html.Td(item['user'])
-            ]) for item in items
-        ])
+        table_body = html.Tbody([product_row(item) for item in items])
 
         tables.append(html.H3(f"Category: {category}"))
         tables.append(html.Table(
@@ -276,8 +334,20 @@ def display_all_products():
 
 
 # 8. Display all transactions
-def display_all_transactions():
-    transactions = read_json(TRANSACTIONS_FILE)
+def transaction_row(transaction):
+    return html.Tr([
+        html.Td(transaction['product_id']),
+        html.Td(transaction['product_name']),
+        html.Td(transaction['operation_type']),
+        html.Td(transaction['operator']),
+        html.Td(transaction['timestamp']),
+        html.Td(transaction['quantity'])
+    ])
+
+
+def display_all_transactions(transactions=None):
+    if transactions is None:
+        transactions = read_json(TRANSACTIONS_FILE)
 
     if not transactions:
         return html.P("No transaction records available.")
@@ -299,16 +369,202 @@ def display_all_transactions():
 
     # table body
     table_body = [
-        html.Tbody([
-            html.Tr([
-                html.Td(transaction['product_id']),
-                html.Td(transaction['product_name']),
-                html.Td(transaction['operation_type']),
-                html.Td(transaction['operator']),
-                html.Td(transaction['timestamp']),
-                html.Td(transaction['quantity'])
-            ]) for transaction in sorted_transactions
-        ])
+        html.Tbody([transaction_row(transaction) for transaction in sorted_transactions])
     ]
 
-    return html.Table(table_header + table_body, style={'width': '100%', 'border': '1px solid black', 'border-collapse': 'collapse'})
\ No newline at end of file
+    return html.Table(table_header + table_body, style={'width': '100%', 'border': '1px solid black', 'border-collapse': 'collapse'})
+
+
+# 9. Sales velocity and reorder points
+VELOCITY_WINDOWS = (7, 30, 90)
+REORDER_REPORT_ROWS = 200
+
+
+def compute_reorder_metrics(lead_time_days=7, safety_days=7, review_days=14, category=None, as_of=None,
+                            progress=None):
+    products = read_json(PRODUCTS_FILE)
+    transactions = read_json(TRANSACTIONS_FILE) or []
+    as_of = as_of or datetime.now().isoformat()
+
+    # ISO timestamps sort lexically, so each window is a plain string comparison
+    end = datetime.fromisoformat(as_of)
+    cutoffs = [(end - timedelta(days=days)).isoformat() for days in VELOCITY_WINDOWS]
+    oldest = cutoffs[-1]
+
+    # one pass over the history, accumulating every window at once
+    sold = {product_id: [0] * len(VELOCITY_WINDOWS) for product_id in products}
+    total = len(transactions)
+    for n, t in enumerate(transactions):
+        if progress and n % PROGRESS_STEP == 0:
+            progress(n, total)
+        timestamp = t['timestamp']
+        if t['operation_type'] != "sale" or timestamp < oldest or timestamp > as_of:
+            continue
+        totals = sold.get(t['product_id'])
+        if totals is None:
+            continue
+        quantity = t['quantity']
+        for i, cutoff in enumerate(cutoffs):
+            if timestamp >= cutoff:
+                totals[i] += quantity
+
+    metrics = []
+    for product_id, product in products.items():
+        if category and product['category'] != category:
+            continue
+        velocity = [units / days for units, days in zip(sold[product_id], VELOCITY_WINDOWS)]
+        # plan on the 30-day rate, but react to a recent spike
+        daily_rate = max(velocity[0], velocity[1])
+        stock = product['stock']
+        reorder_point = daily_rate * (lead_time_days + safety_days)
+        order_up_to = daily_rate * (lead_time_days + safety_days + review_days)
+        metrics.append({
+            'id': product_id,
+            'name': product['name'],
+            'category': product['category'],
+            'stock': stock,
+            'velocity': velocity,
+            'days_of_cover': stock / daily_rate if daily_rate else None,
+            'reorder_point': math.ceil(reorder_point),
+            'reorder_quantity': max(0, math.ceil(order_up_to - stock)) if stock <= reorder_point and daily_rate else 0
+        })
+
+    if progress:
+        progress(total, total)
+    metrics.sort(key=lambda x: (x['days_of_cover'] is None, x['days_of_cover'] or 0))
+    return metrics
+
+
+def reorder_report(lead_time_days=7, safety_days=7, review_days=14, category=None, show_all=False, as_of=None,
+                   progress=None):
+    metrics = compute_reorder_metrics(lead_time_days, safety_days, review_days, category, as_of, progress)
+    if not show_all:
+        metrics = [item for item in metrics if item['reorder_quantity']]
+    if not metrics:
+        if show_all:
+            return html.P("No products available for the reorder report.")
+        return html.P("No products need reordering.")
+
+    # rendering thousands of rows costs more than computing them, so only the most urgent are shown
+    note = None
+    if len(metrics) > REORDER_REPORT_ROWS:
+        note = html.P(f"Showing the {REORDER_REPORT_ROWS} products with the least cover out of {len(metrics)}.")
+        metrics = metrics[:REORDER_REPORT_ROWS]
+
+    # table header
+    table_header = html.Thead(html.Tr(
+        [html.Th("Product ID"), html.Th("Product Name"), html.Th("Category"), html.Th("Stock")] +
+        [html.Th(f"Units/Day ({days}d)") for days in VELOCITY_WINDOWS] +
+        [html.Th("Days of Cover"), html.Th("Reorder Point"), html.Th("Suggested Reorder")]
+    ))
+
+    # table body
+    table_body = html.Tbody([
+        html.Tr(
+            [html.Td(item['id']), html.Td(item['name']), html.Td(item['category']), html.Td(item['stock'])] +
+            [html.Td(f"{rate:.2f}") for rate in item['velocity']] +
+            [html.Td(f"{item['days_of_cover']:.1f}" if item['days_of_cover'] is not None else "-"),
+             html.Td(item['reorder_point']),
+             html.Td(item['reorder_quantity'])]
+        ) for item in metrics
+    ])
+
+    table = html.Table([table_header, table_body],
+                       style={'width': '100%', 'border': '1px solid black', 'border-collapse': 'collapse'})
+    return html.Div([note, table]) if note else table
+
+
+# 10. Live list updates (send only the rows that changed since the client's cursor)
+# recent product tables, keyed by the version string the client keeps as its cursor
+PRODUCT_SNAPSHOTS = 32
+_product_snapshots = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+
+def longest_increasing_run(positions):
+    # indices of a longest increasing subsequence: the rows that can stay where they are
+    tails, tail_index, previous = [], [], [None] * len(positions)
+    for i, position in enumerate(positions):
+        k = bisect.bisect_left(tails, position)
+        if k == len(tails):
+            tails.append(position)
+            tail_index.append(i)
+        else:
+            tails[k] = position
+            tail_index[k] = i
+        previous[i] = tail_index[k - 1] if k else None
+    keep = set()
+    i = tail_index[-1] if tail_index else None
+    while i is not None:
+        keep.add(i)
+        i = previous[i]
+    return keep
+
+
+def patch_table_body(body, old_rows, new_rows, items):
+    old_ids = [row[0] for row in old_rows]
+    new_position = {row[0]: i for i, row in enumerate(new_rows)}
+
+    # drop removed rows and rows that moved, from the bottom up so indices stay valid
+    staying = [i for i, product_id in enumerate(old_ids) if product_id in new_position]
+    keep = {staying[i] for i in longest_increasing_run([new_position[old_ids[i]] for i in staying])}
+    for i in reversed(range(len(old_ids))):
+        if i not in keep:
+            del body[i]
+    current = [old_rows[i] for i in sorted(keep)]
+
+    # then insert new/moved rows at their place and replace rows whose values changed
+    for i, (row, item) in enumerate(zip(new_rows, items)):
+        if i >= len(current) or current[i][0] != row[0]:
+            body.insert(i, product_row(item))
+            current.insert(i, row)
+        elif current[i] != row:
+            body[i] = product_row(item)
+
+
+def update_all_products(cursor=None):
+    products = read_json(PRODUCTS_FILE)
+    grouped = group_products(products)
+    rows = [[category, [[item['id'], item['name'], item['stock'], item['user']] for item in items]]
+            for category, items in grouped]
+    version = hashlib.sha1(json.dumps(rows).encode('utf-8')).hexdigest()
+
+    if version == cursor:
+        return no_update, no_update
+
+    with _snapshot_lock:
+        _product_snapshots[version] = rows
+        _product_snapshots.move_to_end(version)
+        while len(_product_snapshots) > PRODUCT_SNAPSHOTS:
+            _product_snapshots.popitem(last=False)
+        snapshot = _product_snapshots.get(cursor)
+
+    # unknown cursor, empty list, or categories appeared/disappeared: rebuild the tables
+    if not snapshot or not rows or [c for c, _ in snapshot] != [c for c, _ in rows]:
+        return display_all_products(products), version
+
+    # otherwise patch each category table row by row
+    patched = Patch()
+    for k, ((_, items), (_, new_rows), (_, old_rows)) in enumerate(zip(grouped, rows, snapshot)):
+        if new_rows != old_rows:
+            body = patched['props']['children'][2 * k + 1]['props']['children'][1]['props']['children']
+            patch_table_body(body, old_rows, new_rows, items)
+    return patched, version
+
+
+def update_all_transactions(cursor=None):
+    transactions = read_json(TRANSACTIONS_FILE) or []
+
+    if cursor == len(transactions):
+        return no_update, no_update
+
+    # new client, empty list, or a rewritten history: rebuild the table
+    if not cursor or cursor > len(transactions):
+        return display_all_transactions(transactions), len(transactions)
+
+    # transactions are only ever appended, so prepend the new rows newest first
+    patched = Patch()
+    new_transactions = sorted(transactions[cursor:], key=lambda x: x['timestamp'])
+    for transaction in new_transactions:
+        patched['props']['children'][1]['props']['children'].prepend(transaction_row(transaction))
+    return patched, len(transactions)
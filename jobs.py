@@ -0,0 +1,129 @@
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+
+import inventory_manager as inv
+
+# Slow reports run in worker processes, so loading and rendering a large history
+# never holds the interpreter lock the Dash request threads need.
+# The job registry lives in this process, so the app must be served by a single process.
+REPORT_WORKERS = 2
+RESULT_TTL = 120
+
+_executor = None
+_manager = None
+_lock = threading.RLock()
+_jobs = {}
+_in_flight = {}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key, manager):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.subscribers = 1
+        # shared with the worker process: progress goes out, cancellation comes in
+        self.state = manager.dict(done=0, total=0)
+        self.cancelled = manager.Event()
+        self.future = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+
+def _init_worker(products_file, transactions_file):
+    # workers may be spawned rather than forked, so pass on where the data lives
+    inv.PRODUCTS_FILE = products_file
+    inv.TRANSACTIONS_FILE = transactions_file
+
+
+def _run(fn, args, state, cancelled):
+    def progress(done, total):
+        # called from inside the report; raising here unwinds a cancelled job
+        if cancelled.is_set():
+            raise JobCancelled()
+        state.update(done=done, total=total)
+
+    return fn(*args, progress=progress)
+
+
+def _finish(job):
+    with _lock:
+        if job.finished_at is None:
+            job.finished_at = time.time()
+        if _in_flight.get(job.key) is job:
+            del _in_flight[job.key]
+
+
+def _expire():
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job.finished_at and now - job.finished_at > RESULT_TTL:
+            del _jobs[job_id]
+
+
+def _start_pool():
+    global _executor, _manager
+    if _executor is None:
+        _manager = multiprocessing.Manager()
+        _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, initializer=_init_worker,
+                                        initargs=(inv.PRODUCTS_FILE, inv.TRANSACTIONS_FILE))
+
+
+# Submit a report; identical in-flight reports are shared instead of run twice
+def submit(name, fn, *args):
+    key = (name,) + args
+    with _lock:
+        _start_pool()
+        _expire()
+        job = _in_flight.get(key)
+        if job is not None and not job.cancelled.is_set():
+            job.subscribers += 1
+            return job.id
+        job = Job(key, _manager)
+        _jobs[job.id] = job
+        _in_flight[key] = job
+        job.future = _executor.submit(_run, fn, args, job.state, job.cancelled)
+        job.future.add_done_callback(lambda future: _finish(job))
+        return job.id
+
+
+def poll(job_id):
+    job = _jobs.get(job_id)
+    if job is None:
+        return 'missing', None
+    if not job.future.done():
+        return 'running', (job.state['done'], job.state['total'])
+    try:
+        return 'done', job.future.result()
+    except (JobCancelled, CancelledError):
+        return 'cancelled', None
+    except Exception as error:
+        return 'error', error
+
+
+def duration(job_id):
+    # seconds from submission (including time queued for a worker) to completion
+    job = _jobs.get(job_id)
+    if job is None or job.finished_at is None:
+        return None
+    return job.finished_at - job.submitted_at
+
+
+# Drop one subscriber; the job itself stops once nobody is waiting for it
+def cancel(job_id):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job.future.done():
+            return
+        job.subscribers -= 1
+        if job.subscribers <= 0:
+            job.cancelled.set()
+            job.future.cancel()
+            if _in_flight.get(job.key) is job:
+                del _in_flight[job.key]
@@ -0,0 +1,457 @@
+import os
+import json
+import math
+import logging
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import inventory_manager as inv
+
+DASH_ENDPOINT = '/_dash-update-component'
+IDLE_INTERVAL = 3.0
+REPORT_POLL_INTERVAL = 0.5
+DEFAULT_MIX = 'stock=2,autofill=2,query=1,sales=1,idle=4'
+
+
+# Dash callback payloads
+def callback_payload(outputs, inputs, changed, state=()):
+    """Build the JSON body the Dash renderer posts for one callback."""
+    output_specs = [{'id': o_id, 'property': o_prop} for o_id, o_prop in outputs]
+    if len(outputs) == 1:
+        output = f'{outputs[0][0]}.{outputs[0][1]}'
+        output_specs = output_specs[0]
+    else:
+        output = '..' + '...'.join(f'{o_id}.{o_prop}' for o_id, o_prop in outputs) + '..'
+    return {
+        'output': output,
+        'outputs': output_specs,
+        'inputs': [{'id': i_id, 'property': i_prop, 'value': value} for i_id, i_prop, value in inputs],
+        'state': [{'id': s_id, 'property': s_prop, 'value': value} for s_id, s_prop, value in state],
+        'changedPropIds': [f'{c_id}.{c_prop}' for c_id, c_prop in changed]
+    }
+
+
+def stock_payload(product_id, product_name, quantity, operation_type, user):
+    return callback_payload(
+        [('update-stock-status', 'children')],
+        [('submit-btn-stock', 'n_clicks', 1),
+         ('product-id-2', 'value', product_id),
+         ('product-name-2', 'value', product_name),
+         ('quantity-2', 'value', quantity),
+         ('operation-type-2', 'value', operation_type),
+         ('user-2', 'value', user)],
+        [('submit-btn-stock', 'n_clicks')]
+    )
+
+
+def autofill_payload(product_id):
+    return callback_payload(
+        [('product-id-2', 'value'), ('product-name-2', 'value')],
+        [('product-id-2', 'value', product_id),
+         ('product-name-2', 'value', None)],
+        [('product-id-2', 'value')]
+    )
+
+
+# the report callbacks start a background job; the same callback then polls it
+def query_payload(product_id, user, date, job_id=None, poll=0):
+    trigger = ('transaction-job-poll', 'n_intervals') if poll else ('submit-btn-transaction', 'n_clicks')
+    return callback_payload(
+        [('update-transaction-status', 'children'), ('transaction-job', 'data'),
+         ('transaction-job-poll', 'disabled')],
+        [('submit-btn-transaction', 'n_clicks', 1),
+         ('cancel-btn-transaction', 'n_clicks', None),
+         ('transaction-job-poll', 'n_intervals', poll)],
+        [trigger],
+        [('product-id-3', 'value', product_id),
+         ('user-3', 'value', user),
+         ('start-date-3', 'value', date),
+         ('start-time-3', 'value', '00:00:00'),
+         ('end-date-3', 'value', date),
+         ('end-time-3', 'value', '23:59:59'),
+         ('transaction-job', 'data', job_id)]
+    )
+
+
+def sales_payload(category, date, job_id=None, poll=0):
+    trigger = ('sale-job-poll', 'n_intervals') if poll else ('submit-btn-sale', 'n_clicks')
+    return callback_payload(
+        [('sale-list', 'children'), ('sale-job', 'data'), ('sale-job-poll', 'disabled')],
+        [('submit-btn-sale', 'n_clicks', 1),
+         ('cancel-btn-sale', 'n_clicks', None),
+         ('sale-job-poll', 'n_intervals', poll)],
+        [trigger],
+        [('category-4', 'value', category),
+         ('start-date-4', 'value', '2000-01-01'),
+         ('start-time-4', 'value', '00:00:00'),
+         ('end-date-4', 'value', date),
+         ('end-time-4', 'value', '23:59:59'),
+         ('sale-job', 'data', job_id)]
+    )
+
+
+def refresh_payloads(n_intervals, cursors):
+    return {
+        'category_options': callback_payload(
+            [('category-dropdown', 'options')],
+            [('interval-component', 'n_intervals', n_intervals)],
+            [('interval-component', 'n_intervals')]
+        ),
+        'product_list': callback_payload(
+            [('all-product-list', 'children'), ('product-list-cursor', 'data')],
+            [('refresh-1', 'n_intervals', n_intervals)],
+            [('refresh-1', 'n_intervals')],
+            [('product-list-cursor', 'data', cursors.get('product-list-cursor'))]
+        ),
+        'transaction_list': callback_payload(
+            [('all-transaction-list', 'children'), ('transaction-list-cursor', 'data')],
+            [('refresh-2', 'n_intervals', n_intervals)],
+            [('refresh-2', 'n_intervals')],
+            [('transaction-list-cursor', 'data', cursors.get('transaction-list-cursor'))]
+        ),
+    }
+
+
+# Transports: Flask test client (in process) or a running server
+class TestClientTransport:
+    def __init__(self, server):
+        self.server = server
+        self.local = threading.local()
+
+    def post(self, payload):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.server.test_client()
+        response = self.local.client.post(DASH_ENDPOINT, json=payload)
+        body = response.get_json(silent=True) if response.status_code == 200 else None
+        return response.status_code, body
+
+    def job_duration(self, job_id):
+        # report jobs run in this process, so their own timing is available
+        import jobs
+        return jobs.duration(job_id)
+
+    def cancel_job(self, job_id):
+        import jobs
+        jobs.cancel(job_id)
+
+
+class HttpTransport:
+    def __init__(self, url):
+        self.url = url.rstrip('/') + DASH_ENDPOINT
+
+    def post(self, payload):
+        request = urllib.request.Request(
+            self.url, data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                raw = response.read()
+                return response.status, json.loads(raw) if raw else None
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+    def job_duration(self, job_id):
+        return None
+
+    def cancel_job(self, job_id):
+        # the server drops the job once it expires; a cancel request would count as load
+        pass
+
+
+# Load test statistics
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.job_latencies = defaultdict(list)
+        self.stock_delta = defaultdict(int)
+        self.stock_updates = 0
+        self.stock_rejected = 0
+        self.last_finished = None
+
+    def call(self, transport, name, payload):
+        start = time.perf_counter()
+        try:
+            status, body = transport.post(payload)
+        except Exception:
+            status, body = None, None
+        self.record(name, time.perf_counter() - start, error=status is None or status >= 400)
+        return body
+
+    def record(self, name, elapsed, error=False):
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            self.last_finished = time.perf_counter()
+            if error:
+                self.errors[name] += 1
+
+    def record_job(self, name, elapsed):
+        with self.lock:
+            self.job_latencies[name].append(elapsed)
+
+    def record_stock(self, product_id, delta, body):
+        message = None
+        if body:
+            message = body.get('response', {}).get('update-stock-status', {}).get('children')
+        with self.lock:
+            if message == "Stock updated successfully.":
+                self.stock_delta[product_id] += delta
+                self.stock_updates += 1
+            elif body is not None:
+                self.stock_rejected += 1
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    # nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+# Simulated users
+def sleep_until(seconds, deadline):
+    # never sleep past the end of the run
+    time.sleep(max(0.0, min(seconds, deadline - time.time())))
+
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}.")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def run_stock(transport, recorder, rng, products, user, deadline):
+    product_id, product = rng.choice(products)
+    quantity = rng.randint(1, 5)
+    operation_type = rng.choice(['purchase', 'sale'])
+    body = recorder.call(transport, 'update_stock',
+                         stock_payload(product_id, product['name'], quantity, operation_type, user))
+    recorder.record_stock(product_id, quantity if operation_type == 'purchase' else -quantity, body)
+
+
+def run_autofill(transport, recorder, rng, products, user, deadline):
+    # one request per keystroke, as the Dash input fires on every change
+    product_id, _ = rng.choice(products)
+    for i in range(1, len(product_id) + 1):
+        recorder.call(transport, 'auto_fill_product_fields', autofill_payload(product_id[:i]))
+
+
+def run_report(transport, recorder, name, store_id, make_payload, deadline):
+    # submit, then poll like the page's job interval until the job store is cleared
+    body = recorder.call(transport, name, make_payload(None, 0))
+    job_id = (body or {}).get('response', {}).get(store_id, {}).get('data')
+    poll = 0
+    while job_id:
+        sleep_until(REPORT_POLL_INTERVAL, deadline)
+        if time.time() >= deadline:
+            # the run is over; drop the job rather than wait for it
+            transport.cancel_job(job_id)
+            return
+        poll += 1
+        body = recorder.call(transport, f'{name}_poll', make_payload(job_id, poll))
+        if body is None or 'data' in body.get('response', {}).get(store_id, {}):
+            break
+
+    # job latency comes from the job's own completion time, not the poll cadence
+    duration = transport.job_duration(job_id) if job_id else None
+    if duration is not None:
+        recorder.record_job(name, duration)
+
+
+def run_query(transport, recorder, rng, products, user, deadline):
+    product_id, _ = rng.choice(products)
+    product_id, operator, date = rng.choice([product_id, None]), rng.choice([user, None]), time.strftime('%Y-%m-%d')
+    run_report(transport, recorder, 'query_transaction', 'transaction-job',
+               lambda job_id, poll: query_payload(product_id, operator, date, job_id, poll), deadline)
+
+
+def run_sales(transport, recorder, rng, products, user, deadline):
+    categories = sorted({p['category'] for _, p in products})
+    category, date = rng.choice(categories + [None]), time.strftime('%Y-%m-%d')
+    run_report(transport, recorder, 'sales_summary', 'sale-job',
+               lambda job_id, poll: sales_payload(category, date, job_id, poll), deadline)
+
+
+SCENARIOS = {
+    'stock': run_stock,
+    'autofill': run_autofill,
+    'query': run_query,
+    'sales': run_sales,
+    'idle': None,
+}
+
+
+def simulate_user(index, role, transport, recorder, products, deadline, think_time, seed):
+    rng = random.Random(seed + index)
+    user = f'load-user-{index}'
+    n_intervals = 0
+    cursors = {}
+
+    # idle tabs only poll the interval components, keeping their list cursors like the browser store does
+    if role == 'idle':
+        sleep_until(rng.uniform(0, IDLE_INTERVAL), deadline)
+        while time.time() < deadline:
+            for name, payload in refresh_payloads(n_intervals, cursors).items():
+                body = recorder.call(transport, name, payload)
+                for component_id, props in (body or {}).get('response', {}).items():
+                    if 'data' in props:
+                        cursors[component_id] = props['data']
+            n_intervals += 1
+            sleep_until(IDLE_INTERVAL, deadline)
+        return
+
+    while time.time() < deadline:
+        SCENARIOS[role](transport, recorder, rng, products, user, deadline)
+        if think_time:
+            sleep_until(rng.uniform(0, 2 * think_time), deadline)
+
+
+def run_load_test(transport, users, duration, mix, think_time=0.1, seed=0):
+    products = sorted(inv.read_json(inv.PRODUCTS_FILE).items())
+    if not products:
+        raise ValueError("No products available to drive the stock callbacks.")
+    stock_before = {product_id: product['stock'] for product_id, product in products}
+    transactions_before = len(inv.read_json(inv.TRANSACTIONS_FILE) or [])
+
+    weights = parse_mix(mix)
+    rng = random.Random(seed)
+    roles = rng.choices(list(weights), weights=list(weights.values()), k=users)
+
+    recorder = Recorder()
+    deadline = time.time() + duration
+    threads = [
+        threading.Thread(target=simulate_user,
+                         args=(i, role, transport, recorder, products, deadline, think_time, seed))
+        for i, role in enumerate(roles)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # rates are over the active window: the run itself plus any request still in flight at its end
+    elapsed = max(duration, (recorder.last_finished or start) - start)
+
+    # lost updates: acknowledged stock changes missing from products.json / transactions.json;
+    # a file torn by concurrent writes leaves every acknowledged update unverifiable
+    corrupt_files = []
+    drift = None
+    lost_transactions = None
+    try:
+        products_after = inv.read_json(inv.PRODUCTS_FILE)
+    except ValueError:
+        corrupt_files.append(inv.PRODUCTS_FILE)
+    else:
+        drift = {}
+        for product_id, before in stock_before.items():
+            expected = before + recorder.stock_delta.get(product_id, 0)
+            actual = products_after.get(product_id, {}).get('stock')
+            if actual != expected:
+                drift[product_id] = (expected, actual)
+    try:
+        transactions_after = len(inv.read_json(inv.TRANSACTIONS_FILE) or [])
+    except ValueError:
+        corrupt_files.append(inv.TRANSACTIONS_FILE)
+    else:
+        lost_transactions = recorder.stock_updates - (transactions_after - transactions_before)
+
+    return {
+        'elapsed': elapsed,
+        'roles': {role: roles.count(role) for role in weights},
+        'latencies': dict(recorder.latencies),
+        'errors': dict(recorder.errors),
+        'job_latencies': dict(recorder.job_latencies),
+        'stock_updates': recorder.stock_updates,
+        'stock_rejected': recorder.stock_rejected,
+        'lost_transactions': lost_transactions,
+        'stock_drift': drift,
+        'corrupt_files': corrupt_files,
+    }
+
+
+def print_report(result):
+    elapsed = result['elapsed']
+    total = sum(len(v) for v in result['latencies'].values())
+    print(f"Users: {', '.join(f'{k}={v}' for k, v in result['roles'].items())}")
+    print(f"Duration: {elapsed:.1f}s, requests: {total}, throughput: {total / elapsed:.1f} req/s")
+    print()
+    print(f"{'Callback':<26}{'Count':>8}{'Req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Errors':>8}")
+    for name, values in sorted(result['latencies'].items()):
+        print(f"{name:<26}{len(values):>8}{len(values) / elapsed:>8.1f}"
+              f"{percentile(values, 50) * 1000:>9.1f}{percentile(values, 95) * 1000:>9.1f}"
+              f"{percentile(values, 99) * 1000:>9.1f}{result['errors'].get(name, 0):>8}")
+    print()
+    if result['job_latencies']:
+        print(f"{'Background job':<26}{'Count':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for name, values in sorted(result['job_latencies'].items()):
+            print(f"{name:<26}{len(values):>8}{percentile(values, 50) * 1000:>9.1f}"
+                  f"{percentile(values, 95) * 1000:>9.1f}{percentile(values, 99) * 1000:>9.1f}")
+        print()
+    elif any(name.endswith('_poll') for name in result['latencies']):
+        print("Background job latency is only measured in test-client mode.")
+        print()
+    print(f"Stock updates acknowledged: {result['stock_updates']} (rejected: {result['stock_rejected']})")
+    for file_path in result['corrupt_files']:
+        print(f"Corrupt after the run (not valid JSON): {file_path}")
+    if result['lost_transactions'] is None:
+        print(f"Lost updates: unverifiable, all {result['stock_updates']} acknowledged updates "
+              f"(transactions.json is corrupt)")
+    else:
+        print(f"Lost updates (acknowledged but not in transactions.json): {result['lost_transactions']}")
+    if result['stock_drift'] is None:
+        print(f"Stock drift: unverifiable, all {result['stock_updates']} acknowledged updates "
+              f"(products.json is corrupt)")
+        return
+    print(f"Products with stock drift: {len(result['stock_drift'])}")
+    for product_id, (expected, actual) in sorted(result['stock_drift'].items()):
+        print(f"  {product_id}: expected {expected}, found {actual}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drive the Dash callbacks with concurrent simulated users.")
+    parser.add_argument('--users', type=int, default=20, help="number of concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=30, help="test duration in seconds")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"weighted user mix over {', '.join(SCENARIOS)} (default: {DEFAULT_MIX})")
+    parser.add_argument('--think-time', type=float, default=0.1, help="mean pause between actions in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help="run against a live server (e.g. http://127.0.0.1:8050) "
+                                      "instead of the Flask test client; this mutates its data files")
+    args = parser.parse_args()
+
+    if args.url:
+        print_report(run_load_test(HttpTransport(args.url), args.users, args.duration, args.mix,
+                                   args.think_time, args.seed))
+    else:
+        # work on a scratch copy so the real data files stay untouched
+        scratch_dir = tempfile.mkdtemp(prefix='inventory-load-')
+        try:
+            for file_path in (inv.PRODUCTS_FILE, inv.TRANSACTIONS_FILE):
+                if os.path.exists(file_path):
+                    shutil.copy(file_path, scratch_dir)
+            inv.PRODUCTS_FILE = os.path.join(scratch_dir, os.path.basename(inv.PRODUCTS_FILE))
+            inv.TRANSACTIONS_FILE = os.path.join(scratch_dir, os.path.basename(inv.TRANSACTIONS_FILE))
+
+            from app import app
+            # callback errors are counted in the report; one traceback per 500 would bury it
+            app.logger.setLevel(logging.CRITICAL)
+            app.server.logger.setLevel(logging.CRITICAL)
+            print_report(run_load_test(TestClientTransport(app.server), args.users, args.duration, args.mix,
+                                       args.think_time, args.seed))
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
@@ -0,0 +1,140 @@
+import os
+import argparse
+from functools import partial
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import inventory_manager as inv
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+# Replay one slice of the transaction log into net stock movements
+def replay_chunk(transactions, created=None):
+    created = created or {}
+    movements = Counter()
+    for t in transactions:
+        # skip history from before the product ID was (re-)added
+        if t['timestamp'] < created.get(t['product_id'], ''):
+            continue
+        if t['operation_type'] == "purchase":
+            movements[t['product_id']] += t['quantity']
+        elif t['operation_type'] == "sale":
+            movements[t['product_id']] -= t['quantity']
+    return movements
+
+
+def replay_transactions(transactions, created=None, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    # the replay itself is cheap integer arithmetic; a pool only pays off when it
+    # outweighs pickling the chunks, so it is opt-in
+    if workers <= 1 or len(transactions) <= chunk_size:
+        return replay_chunk(transactions, created)
+
+    # stock movements commute, so the chunks can be summed in any order
+    chunks = [transactions[i:i + chunk_size] for i in range(0, len(transactions), chunk_size)]
+    expected = Counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for movements in pool.map(partial(replay_chunk, created=created), chunks):
+            expected.update(movements)
+    return expected
+
+
+def reconcile_stock(workers=1, chunk_size=DEFAULT_CHUNK_SIZE, repair=False, repair_legacy=False):
+    products = inv.read_json(inv.PRODUCTS_FILE)
+    transactions = inv.read_json(inv.TRANSACTIONS_FILE) or []
+    created = {product_id: product['created'] for product_id, product in products.items() if product.get('created')}
+    expected = replay_transactions(transactions, created, workers, chunk_size)
+
+    # IDs with history from before their current creation were deleted and re-added
+    readded = sorted({t['product_id'] for t in transactions if t['timestamp'] < created.get(t['product_id'], '')})
+
+    # products added before creation was recorded may have been deleted and re-added, with
+    # history from the old product mixed in, so they are only repaired on explicit request
+    discrepancies = []
+    unverified = []
+    for product_id, product in products.items():
+        if product['stock'] != expected.get(product_id, 0):
+            row = (product_id, product['name'], product['stock'], expected.get(product_id, 0))
+            if 'created' not in product and not repair_legacy:
+                unverified.append(row)
+            else:
+                discrepancies.append(row)
+
+    # history for products no longer in the catalog (deleted, never re-added)
+    orphaned = sorted(product_id for product_id in expected if product_id not in products)
+
+    # the app writes products.json and transactions.json without coordination, so a stock
+    # update landing during the run looks like drift; only repair if nothing changed meanwhile
+    changed = False
+    if repair and discrepancies:
+        changed = (inv.read_json(inv.PRODUCTS_FILE) != products or
+                   (inv.read_json(inv.TRANSACTIONS_FILE) or []) != transactions)
+        if not changed:
+            for product_id, _, _, expected_stock in discrepancies:
+                products[product_id]['stock'] = expected_stock
+            inv.write_json(inv.PRODUCTS_FILE, products)
+
+    return {
+        'transactions': len(transactions),
+        'products': len(products),
+        'discrepancies': discrepancies,
+        'orphaned': orphaned,
+        'readded': readded,
+        'unverified': unverified,
+        'changed': changed,
+        'repaired': repair and bool(discrepancies) and not changed,
+    }
+
+
+def print_report(result):
+    print(f"Replayed {result['transactions']} transactions against {result['products']} products.")
+    if not result['discrepancies']:
+        print("Stock matches the transaction history.")
+    else:
+        print(f"{'Product ID':<14}{'Name':<24}{'Recorded':>10}{'Expected':>10}{'Diff':>8}")
+        for product_id, name, recorded, expected in result['discrepancies']:
+            print(f"{product_id:<14}{name:<24}{recorded:>10}{expected:>10}{recorded - expected:>8}")
+        if result['repaired']:
+            print(f"Repaired {len(result['discrepancies'])} products in {inv.PRODUCTS_FILE}.")
+        elif result['changed']:
+            print("Data files changed during reconciliation, nothing repaired. Stop the app and run again.")
+        else:
+            print("Run with --repair to overwrite the recorded stock with the expected values.")
+    if result['unverified']:
+        print("Products without a creation stamp, possibly deleted and re-added (not repaired, see --repair-legacy):")
+        for product_id, name, recorded, expected in result['unverified']:
+            print(f"  {product_id} {name}: recorded {recorded}, history {expected}")
+    if result['readded']:
+        print(f"Re-added products (history before re-adding ignored): {', '.join(result['readded'])}")
+    if result['orphaned']:
+        print(f"History for products not in the catalog: {', '.join(result['orphaned'])}")
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Replay transactions.json and verify stock in products.json.",
+        epilog="Stop the app before using --repair: the app updates both files without locking, so changes "
+               "made during a run show up as drift and could be overwritten. Repair is skipped if either "
+               "file changed while reconciling.")
+    parser.add_argument('--workers', type=positive_int, default=1,
+                        help=f"replay across a process pool of this size (default: serial; up to {os.cpu_count()})")
+    parser.add_argument('--chunk-size', type=positive_int, default=DEFAULT_CHUNK_SIZE,
+                        help="transactions replayed per worker task")
+    parser.add_argument('--repair', action='store_true',
+                        help="write the expected stock back to products.json (stop the app first)")
+    parser.add_argument('--repair-legacy', action='store_true',
+                        help="also repair products added before creation stamps were recorded, "
+                             "trusting their full history")
+    args = parser.parse_args()
+
+    result = reconcile_stock(args.workers, args.chunk_size, args.repair, args.repair_legacy)
+    print_report(result)
+    if (result['discrepancies'] and not result['repaired']) or result['unverified']:
+        raise SystemExit(1)